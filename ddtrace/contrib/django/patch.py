@@ -6,14 +6,15 @@ Django internals are instrumented via normal `patch()`.
 `django.apps.registry.Apps.populate` is patched to add instrumentation for any
 specific Django apps like Django Rest Framework (DRF).
 """
-from inspect import getmro
+import functools
+import importlib
 from inspect import isclass
 from inspect import isfunction
 import sys
+import weakref
 
 from ddtrace import Pin
 from ddtrace import config
-from ddtrace.constants import SPAN_MEASURED_KEY
 from ddtrace.contrib import dbapi
 from ddtrace.contrib import func_name
 
@@ -29,8 +30,11 @@ except ImportError:
 from ddtrace.ext import SpanTypes
 from ddtrace.ext import http
 from ddtrace.ext import sql as sqlx
+from ddtrace.internal.compat import binary_type
 from ddtrace.internal.compat import maybe_stringify
+from ddtrace.internal.compat import string_type
 from ddtrace.internal.logger import get_logger
+from ddtrace.utils.cache import cached
 from ddtrace.utils.formats import asbool
 from ddtrace.utils.formats import get_env
 from ddtrace.vendor import wrapt
@@ -64,23 +68,92 @@ config._add(
 )
 
 
+CACHE_METHODS = ("get", "set", "add", "delete", "incr", "decr", "get_many", "set_many", "delete_many")
+
+# Django modules which have to be imported before they can be patched
+_REQUIRED_MODULES = (
+    "django.core.handlers.base",
+    "django.template.base",
+    "django.conf.urls.static",
+    "django.views.generic.base",
+)
+
+_TAG_CACHE_BACKEND = "django.cache.backend"
+_TAG_CACHE_KEY = "django.cache.key"
+_TAG_TEMPLATE_NAME = "django.template.name"
+_TAG_TEMPLATE_ENGINE_CLASS = "django.template.engine.class"
+_TAG_DB_VENDOR = "django.db.vendor"
+_TAG_DB_ALIAS = "django.db.alias"
+
+# (settings id, MIDDLEWARE, MIDDLEWARE_CLASSES) combinations whose middleware has been instrumented
+_INSTRUMENTED_MIDDLEWARE_SETTINGS = set()
+
+# View classes whose methods have already been instrumented
+_INSTRUMENTED_VIEWS = weakref.WeakSet()  # type: weakref.WeakSet[type]
+# Response classes of views whose methods have already been instrumented
+_INSTRUMENTED_RESPONSES = weakref.WeakSet()  # type: weakref.WeakSet[type]
+
+_VIEW_LIFECYCLE_METHOD_NAMES = ("setup", "dispatch", "http_method_not_allowed")
+_DEFAULT_VIEW_METHOD_NAMES = ("get", "delete", "post", "options", "head") + _VIEW_LIFECYCLE_METHOD_NAMES
+
+
+def _cached_func_name(obj):
+    """Return ``func_name(obj)`` for a class or class instance, memoized on the class."""
+    if isclass(obj):
+        cls = obj
+    elif hasattr(obj, "__name__"):
+        # DEV: functions and other objects with their own name cannot be memoized on their type
+        return func_name(obj)
+    else:
+        cls = obj.__class__
+
+    # DEV: only look at the class' own dict so subclasses do not inherit the name of their parent
+    name = cls.__dict__.get("_dd_func_name")
+    if name is None:
+        name = func_name(obj)
+        try:
+            cls._dd_func_name = name
+        except TypeError:
+            # Built-in and extension types do not allow setting attributes
+            pass
+    return name
+
+
 def patch_conn(django, conn):
-    def cursor(django, pin, func, instance, args, kwargs):
-        alias = getattr(conn, "alias", "default")
+    # The alias and vendor of a connection never change, so everything derived
+    # from them is computed once here rather than on every cursor() call.
+    alias = getattr(conn, "alias", "default")
+    vendor = getattr(conn, "vendor", "db")
+    prefix = sqlx.normalize_vendor(vendor)
+    tags = {
+        _TAG_DB_VENDOR: vendor,
+        _TAG_DB_ALIAS: alias,
+    }
+    # DEV: the service name prefix can be changed at runtime, so keep one formatted
+    #      service name per prefix instead of a single precomputed value
+    service_names = {}
+    # DEV: the pin only depends on the service name and tracer, keep the last one built
+    #      so that it is shared by the cursors of this connection
+    cursor_pins = {}
 
-        if config.django.database_service_name:
-            service = config.django.database_service_name
-        else:
-            database_prefix = config.django.database_service_name_prefix
-            service = "{}{}{}".format(database_prefix, alias, "db")
-
-        vendor = getattr(conn, "vendor", "db")
-        prefix = sqlx.normalize_vendor(vendor)
-        tags = {
-            "django.db.vendor": vendor,
-            "django.db.alias": alias,
-        }
-        pin = Pin(service, tags=tags, tracer=pin.tracer, app=prefix)
+    def cursor(django, pin, func, instance, args, kwargs):
+        # DEV: bind the integration config once, the values themselves can be
+        #      changed at runtime so they must still be read on every call
+        int_config = config.django
+
+        service = int_config.database_service_name
+        if not service:
+            database_prefix = int_config.database_service_name_prefix
+            service = service_names.get(database_prefix)
+            if service is None:
+                service = service_names[database_prefix] = "{}{}{}".format(database_prefix, alias, "db")
+
+        key = (service, pin.tracer)
+        cursor_pin = cursor_pins.get(key)
+        if cursor_pin is None:
+            cursor_pins.clear()
+            cursor_pin = cursor_pins[key] = Pin(service, tags=tags, tracer=pin.tracer, app=prefix)
+        pin = cursor_pin
         cursor = func(*args, **kwargs)  # type: django.db.backends.utils.CursorWrapper
 
         # if legacy behavior is desired
@@ -91,7 +164,7 @@ def patch_conn(django, conn):
         # else
         #   wrap the unwrapped cursor.cursor
 
-        if config.django.use_legacy_db_wrapping:
+        if int_config.use_legacy_db_wrapping:
             # https://github.com/DataDog/dd-trace-py/commit/af326b6a289600d9ba43d6979dc4de713d85aebe#diff-8f30c25b0c036c175363c0913e45dfa2a17cc2fd41f65669202423501b1e60fb
             traced_cursor_cls = dbapi.TracedCursor
             if (
@@ -100,24 +173,25 @@ def patch_conn(django, conn):
                 and isinstance(cursor.cursor, psycopg_cursor_cls)
             ):
                 traced_cursor_cls = Psycopg2TracedCursor
-            return traced_cursor_cls(cursor, pin, config.django)
+            return traced_cursor_cls(cursor, pin, int_config)
         elif isinstance(cursor.cursor, dbapi.TracedCursor):
             # Update the pin used on the cursor to have django metadata
             existing_pin = Pin.get_from(cursor.cursor)
             if not existing_pin:
                 pin.onto(cursor.cursor)
+            elif existing_pin.tags is not None:
+                existing_pin.tags[_TAG_DB_VENDOR] = vendor
+                existing_pin.tags[_TAG_DB_ALIAS] = alias
             else:
-                if existing_pin.tags:
-                    existing_pin.tags.update(pin.tags)
-                else:
-                    existing_pin.tags = pin.tags.copy()
-                # TODO: Do we update the service?
+                # DEV: pins cannot be mutated, attach a copy which has the django tags
+                existing_pin.clone(tags=dict(tags)).onto(cursor.cursor)
+            # TODO: Do we update the service?
         else:
             # Wrap the cursor
             traced_cursor_cls = dbapi.TracedCursor
             if Psycopg2TracedCursor is not None and isinstance(cursor.cursor, psycopg_cursor_cls):
                 traced_cursor_cls = Psycopg2TracedCursor
-            setattr(cursor, "cursor", traced_cursor_cls(cursor.cursor, pin, config.django))
+            cursor.cursor = traced_cursor_cls(cursor.cursor, pin, int_config)
         return cursor
 
     if not isinstance(conn.cursor, wrapt.ObjectProxy):
@@ -141,37 +215,54 @@ def instrument_dbs(django):
 
 @trace_utils.with_traced_module
 def traced_cache(django, pin, func, instance, args, kwargs):
-    if not config.django.instrument_caches:
+    int_config = config.django
+    if not int_config.instrument_caches:
         return func(*args, **kwargs)
 
-    # get the original function method
-    with pin.tracer.trace("django.cache", span_type=SpanTypes.CACHE, service=config.django.cache_service_name) as span:
-        # update the resource name and tag the cache backend
-        span.resource = utils.resource_from_cache_prefix(func_name(func), instance)
-        cache_backend = "{}.{}".format(instance.__module__, instance.__class__.__name__)
-        span._set_str_tag("django.cache.backend", cache_backend)
+    with pin.tracer.trace(
+        "django.cache",
+        resource=_cache_resource((getattr(func, "__func__", func), getattr(instance, "key_prefix", None))),
+        span_type=SpanTypes.CACHE,
+        service=int_config.cache_service_name,
+    ) as span:
+        # tag the cache backend
+        span._set_str_tag(_TAG_CACHE_BACKEND, _cached_func_name(instance.__class__))
 
         if args:
             keys = utils.quantize_key_values(args[0])
-            span._set_str_tag("django.cache.key", str(keys))
+            # DEV: do not tag empty collections of keys, e.g. ``get_many([])``, but keep falsy keys like ``""`` or ``0``
+            if isinstance(keys, (string_type, binary_type)) or not hasattr(keys, "__len__") or len(keys) > 0:
+                span._set_str_tag(_TAG_CACHE_KEY, str(keys))
 
         return func(*args, **kwargs)
 
 
+@cached()
+def _cache_resource(key):
+    """Return the resource name of a call to a cache method given a ``(method, key prefix)`` tuple.
+
+    The name has the same format as ``utils.resource_from_cache_prefix()``.
+    """
+    func, key_prefix = key
+    resource = func_name(func)
+    if key_prefix:
+        resource = " ".join((resource, key_prefix))
+    return resource.lower()
+
+
 def instrument_caches(django):
     cache_backends = set([cache["BACKEND"] for cache in django.conf.settings.CACHES.values()])
     for cache_path in cache_backends:
-        split = cache_path.split(".")
-        cache_module = ".".join(split[:-1])
-        cache_cls = split[-1]
-        for method in ["get", "set", "add", "delete", "incr", "decr", "get_many", "set_many", "delete_many"]:
-            try:
-                cls = django.utils.module_loading.import_string(cache_path)
-                # DEV: this can be removed when we add an idempotent `wrap`
-                if not trace_utils.iswrapped(cls, method):
-                    trace_utils.wrap(cache_module, "{0}.{1}".format(cache_cls, method), traced_cache(django))
-            except Exception:
-                log.debug("Error instrumenting cache %r", cache_path, exc_info=True)
+        try:
+            cls = django.utils.module_loading.import_string(cache_path)
+            _cached_func_name(cls)
+            traced = traced_cache(django)
+            for method in CACHE_METHODS:
+                # DEV: the iswrapped check can be removed when we add an idempotent `wrap`
+                if hasattr(cls, method) and not trace_utils.iswrapped(cls, method):
+                    trace_utils.wrap(cls, method, traced)
+        except Exception:
+            log.debug("Error instrumenting cache %r", cache_path, exc_info=True)
 
 
 @trace_utils.with_traced_module
@@ -260,12 +351,17 @@ def traced_process_exception(django, name, resource=None):
 @trace_utils.with_traced_module
 def traced_load_middleware(django, pin, func, instance, args, kwargs):
     """Patches django.core.handlers.base.BaseHandler.load_middleware to instrument all middlewares."""
-    settings_middleware = []
+    settings = django.conf.settings
+    middleware = tuple(getattr(settings, "MIDDLEWARE", None) or ())
+    middleware_classes = tuple(getattr(settings, "MIDDLEWARE_CLASSES", None) or ())
+
+    # The middleware for a given configuration only has to be instrumented once
+    key = (id(settings), middleware, middleware_classes)
+    if key in _INSTRUMENTED_MIDDLEWARE_SETTINGS:
+        return func(*args, **kwargs)
+
     # Gather all the middleware
-    if getattr(django.conf.settings, "MIDDLEWARE", None):
-        settings_middleware += django.conf.settings.MIDDLEWARE
-    if getattr(django.conf.settings, "MIDDLEWARE_CLASSES", None):
-        settings_middleware += django.conf.settings.MIDDLEWARE_CLASSES
+    settings_middleware = middleware + middleware_classes
 
     # Iterate over each middleware provided in settings.py
     # Each middleware can either be a function or a class
@@ -314,43 +410,82 @@ def traced_load_middleware(django, pin, func, instance, args, kwargs):
                     mw, "process_exception", traced_process_exception(django, "django.middleware", resource=res)
                 )
 
+    _INSTRUMENTED_MIDDLEWARE_SETTINGS.add(key)
     return func(*args, **kwargs)
 
 
-@trace_utils.with_traced_module
-def traced_get_response(django, pin, func, instance, args, kwargs):
+def _traced_get_response_impl(django, pin, orig, instance, args, kwargs):
     """Trace django.core.handlers.base.BaseHandler.get_response() (or other implementations).
 
     This is the main entry point for requests.
 
     Django requests are handled by a Handler.get_response method (inherited from base.BaseHandler).
     This method invokes the middleware chain and returns the response generated by the chain.
+
+    ``orig`` is the original unbound ``get_response`` function, see ``_patch_get_response()``.
     """
 
-    request = kwargs.get("request", args[0])
-    if request is None:
-        return func(*args, **kwargs)
+    # DEV: Django always passes the request positionally, avoid the kwargs lookup in that case
+    try:
+        request = args[0]
+    except IndexError:
+        if "request" not in kwargs:
+            # Let Django raise its own error for the missing request
+            return orig(instance, *args, **kwargs)
+        request = kwargs["request"]
 
-    trace_utils.activate_distributed_headers(pin.tracer, int_config=config.django, request_headers=request.META)
+    int_config = config.django
+    trace_utils.activate_distributed_headers(pin.tracer, int_config=int_config, request_headers=request.META)
 
     with pin.tracer.trace(
         "django.request",
         resource=request.method,
-        service=trace_utils.int_service(pin, config.django),
+        service=trace_utils.int_service(pin, int_config),
         span_type=SpanTypes.WEB,
     ) as span:
+        # DEV: this also marks the span as measured
         utils._before_request_tags(pin, span, request)
-        span.metrics[SPAN_MEASURED_KEY] = 1
 
         response = None
         try:
-            response = func(*args, **kwargs)
+            response = orig(instance, *args, **kwargs)
             return response
         finally:
             # DEV: Always set these tags, this is where `span.resource` is set
             utils._after_request_tags(pin, span, request, response)
 
 
+def _patch_get_response(django):
+    """Replace BaseHandler.get_response with a plain function tracing each request.
+
+    DEV: get_response is called for every request, so it is patched directly instead of
+         using a wrapt wrapper to avoid the proxy overhead on the request hot path.
+    """
+    handler_cls = django.core.handlers.base.BaseHandler
+    get_response = handler_cls.__dict__["get_response"]
+    if hasattr(get_response, "__dd_orig"):
+        return
+
+    @functools.wraps(get_response)
+    def _traced_get_response(self, *args, **kwargs):
+        pin = Pin._find(self, django)
+        if pin and pin.enabled():
+            return _traced_get_response_impl(django, pin, get_response, self, args, kwargs)
+        elif not pin:
+            log.debug("Pin not found for traced method %r", get_response)
+        return get_response(self, *args, **kwargs)
+
+    setattr(_traced_get_response, "__dd_orig", get_response)
+    handler_cls.get_response = _traced_get_response
+
+
+def _unpatch_get_response(django):
+    handler_cls = django.core.handlers.base.BaseHandler
+    get_response = getattr(handler_cls.__dict__["get_response"], "__dd_orig", None)
+    if get_response is not None:
+        handler_cls.get_response = get_response
+
+
 @trace_utils.with_traced_module
 def traced_template_render(django, pin, wrapped, instance, args, kwargs):
     """Instrument django.template.base.Template.render for tracing template rendering."""
@@ -358,14 +493,14 @@ def traced_template_render(django, pin, wrapped, instance, args, kwargs):
     if template_name:
         resource = template_name
     else:
-        resource = "{0}.{1}".format(func_name(instance), wrapped.__name__)
+        resource = "{0}.{1}".format(_cached_func_name(instance), wrapped.__name__)
 
     with pin.tracer.trace("django.template.render", resource=resource, span_type=http.TEMPLATE) as span:
         if template_name:
-            span._set_str_tag("django.template.name", template_name)
+            span._set_str_tag(_TAG_TEMPLATE_NAME, template_name)
         engine = getattr(instance, "engine", None)
         if engine:
-            span._set_str_tag("django.template.engine.class", func_name(engine))
+            span._set_str_tag(_TAG_TEMPLATE_ENGINE_CLASS, _cached_func_name(engine))
 
         return wrapped(*args, **kwargs)
 
@@ -377,8 +512,10 @@ def instrument_view(django, view):
     We want to wrap all lifecycle/http method functions for every class in the MRO for this view
     """
     if hasattr(view, "__mro__"):
-        for cls in reversed(getmro(view)):
-            _instrument_view(django, cls)
+        # DEV: walk the MRO from the base classes down, skipping ``object`` which has nothing to instrument
+        for cls in view.__mro__[-2::-1]:
+            if cls not in _INSTRUMENTED_VIEWS:
+                _instrument_view(django, cls)
 
     return _instrument_view(django, view)
 
@@ -389,24 +526,42 @@ def _instrument_view(django, view):
     if not callable(view):
         return view
 
+    # The methods of a view class only need to be instrumented once
+    if not (isclass(view) and view in _INSTRUMENTED_VIEWS):
+        _instrument_view_methods(django, view)
+
+    # If the view itself is not wrapped, wrap it
+    if not isinstance(view, wrapt.ObjectProxy):
+        view = wrapt.FunctionWrapper(
+            view,
+            traced_func(django, "django.view", resource=_cached_func_name(view), ignored_excs=[django.http.Http404]),
+        )
+    return view
+
+
+def _instrument_view_methods(django, view):
+    """Helper to wrap the HTTP, lifecycle and response methods of Django views."""
     # Patch view HTTP methods and lifecycle methods
-    http_method_names = getattr(view, "http_method_names", ("get", "delete", "post", "options", "head"))
-    lifecycle_methods = ("setup", "dispatch", "http_method_not_allowed")
-    for name in list(http_method_names) + list(lifecycle_methods):
+    http_method_names = getattr(view, "http_method_names", None)
+    if http_method_names is None:
+        method_names = _DEFAULT_VIEW_METHOD_NAMES
+    else:
+        method_names = tuple(http_method_names) + _VIEW_LIFECYCLE_METHOD_NAMES
+    for name in method_names:
         try:
             func = getattr(view, name, None)
             if not func or isinstance(func, wrapt.ObjectProxy):
                 continue
 
-            resource = "{0}.{1}".format(func_name(view), name)
+            resource = "{0}.{1}".format(_cached_func_name(view), name)
             op_name = "django.view.{0}".format(name)
             trace_utils.wrap(view, name, traced_func(django, name=op_name, resource=resource))
         except Exception:
             log.debug("Failed to instrument Django view %r function %s", view, name, exc_info=True)
 
-    # Patch response methods
+    # Patch response methods, response classes are shared by many views so only do it once per class
     response_cls = getattr(view, "response_class", None)
-    if response_cls:
+    if response_cls and not (isclass(response_cls) and response_cls in _INSTRUMENTED_RESPONSES):
         methods = ("render",)
         for name in methods:
             try:
@@ -415,18 +570,16 @@ def _instrument_view(django, view):
                 if not func or isinstance(func, wrapt.ObjectProxy):
                     continue
 
-                resource = "{0}.{1}".format(func_name(response_cls), name)
+                resource = "{0}.{1}".format(_cached_func_name(response_cls), name)
                 op_name = "django.response.{0}".format(name)
                 trace_utils.wrap(response_cls, name, traced_func(django, name=op_name, resource=resource))
             except Exception:
                 log.debug("Failed to instrument Django response %r function %s", response_cls, name, exc_info=True)
+        if isclass(response_cls):
+            _INSTRUMENTED_RESPONSES.add(response_cls)
 
-    # If the view itself is not wrapped, wrap it
-    if not isinstance(view, wrapt.ObjectProxy):
-        view = wrapt.FunctionWrapper(
-            view, traced_func(django, "django.view", resource=func_name(view), ignored_excs=[django.http.Http404])
-        )
-    return view
+    if isclass(view):
+        _INSTRUMENTED_VIEWS.add(view)
 
 
 @trace_utils.with_traced_module
@@ -436,9 +589,7 @@ def traced_urls_path(django, pin, wrapped, instance, args, kwargs):
         if "view" in kwargs:
             kwargs["view"] = instrument_view(django, kwargs["view"])
         elif len(args) >= 2:
-            args = list(args)
-            args[1] = instrument_view(django, args[1])
-            args = tuple(args)
+            args = (args[0], instrument_view(django, args[1])) + args[2:]
     except Exception:
         log.debug("Failed to instrument Django url path %r %r", args, kwargs, exc_info=True)
     return wrapped(*args, **kwargs)
@@ -454,7 +605,7 @@ def traced_as_view(django, pin, func, instance, args, kwargs):
     except Exception:
         log.debug("Failed to instrument Django view %r", instance, exc_info=True)
     view = func(*args, **kwargs)
-    return wrapt.FunctionWrapper(view, traced_func(django, "django.view", resource=func_name(view)))
+    return wrapt.FunctionWrapper(view, traced_func(django, "django.view", resource=_cached_func_name(view)))
 
 
 @trace_utils.with_traced_module
@@ -467,18 +618,24 @@ def traced_get_asgi_application(django, pin, func, instance, args, kwargs):
     return TraceMiddleware(func(*args, **kwargs), integration_config=config.django, span_modifier=django_asgi_modifier)
 
 
+def _ensure_modules(names):
+    """Import the given modules if they have not been imported yet."""
+    for name in names:
+        if name not in sys.modules:
+            importlib.import_module(name)
+
+
 def _patch(django):
     Pin().onto(django)
     trace_utils.wrap(django, "apps.registry.Apps.populate", traced_populate(django))
 
-    # DEV: this check will be replaced with import hooks in the future
-    if "django.core.handlers.base" not in sys.modules:
-        import django.core.handlers.base
+    # DEV: this will be replaced with import hooks in the future
+    _ensure_modules(_REQUIRED_MODULES)
 
     if config.django.instrument_middleware:
         trace_utils.wrap(django, "core.handlers.base.BaseHandler.load_middleware", traced_load_middleware(django))
 
-    trace_utils.wrap(django, "core.handlers.base.BaseHandler.get_response", traced_get_response(django))
+    _patch_get_response(django)
     if hasattr(django.core.handlers.base.BaseHandler, "get_response_async"):
         # Have to inline this import as the module contains syntax incompatible with Python 3.5 and below
         from ._asgi import traced_get_response_async
@@ -495,22 +652,13 @@ def _patch(django):
             else:
                 trace_utils.wrap(django, "core.asgi.get_asgi_application", traced_get_asgi_application(django))
 
-    # DEV: this check will be replaced with import hooks in the future
-    if "django.template.base" not in sys.modules:
-        import django.template.base
     trace_utils.wrap(django, "template.base.Template.render", traced_template_render(django))
 
-    # DEV: this check will be replaced with import hooks in the future
-    if "django.conf.urls.static" not in sys.modules:
-        import django.conf.urls.static
     trace_utils.wrap(django, "conf.urls.url", traced_urls_path(django))
     if django.VERSION >= (2, 0, 0):
         trace_utils.wrap(django, "urls.path", traced_urls_path(django))
         trace_utils.wrap(django, "urls.re_path", traced_urls_path(django))
 
-    # DEV: this check will be replaced with import hooks in the future
-    if "django.views.generic.base" not in sys.modules:
-        import django.views.generic.base
     trace_utils.wrap(django, "views.generic.base.View.as_view", traced_as_view(django))
 
 
@@ -535,7 +683,9 @@ def patch():
 def _unpatch(django):
     trace_utils.unwrap(django.apps.registry.Apps, "populate")
     trace_utils.unwrap(django.core.handlers.base.BaseHandler, "load_middleware")
-    trace_utils.unwrap(django.core.handlers.base.BaseHandler, "get_response")
+    _INSTRUMENTED_MIDDLEWARE_SETTINGS.clear()
+    _cache_resource.invalidate()
+    _unpatch_get_response(django)
     trace_utils.unwrap(django.core.handlers.base.BaseHandler, "get_response_async")
     trace_utils.unwrap(django.template.base.Template, "render")
     trace_utils.unwrap(django.conf.urls.static, "static")
@@ -4,16 +4,22 @@ import os
 import platform
 import sys
 from typing import Any
+from typing import Callable
 from typing import Dict
+from typing import Optional
 from typing import TYPE_CHECKING
+from typing import Tuple
 from typing import Union
 
 import pkg_resources
 
 import ddtrace
+from ddtrace.internal.compat import monotonic
 from ddtrace.internal.writer import AgentWriter
 from ddtrace.internal.writer import LogWriter
+from ddtrace.internal.writer import TraceWriter
 
+from . import forksafe
 from .logger import get_logger
 
 
@@ -23,55 +29,152 @@ if TYPE_CHECKING:
 
 logger = get_logger(__name__)
 
+# ddtrace-run adds itself to the PYTHONPATH of the process it starts, so this only needs to be checked once
+_ENABLED_CLI = "ddtrace" in os.getenv("PYTHONPATH", "")
+
+# The interpreter of the process cannot change, so whether it runs in a virtual environment is only checked once
+_IN_VENV = None  # type: Optional[bool]
+
+# Installed packages do not change during the lifetime of the process so they are only collected once
+_PACKAGES = None  # type: Optional[Dict[str, str]]
+_PACKAGES_LOCK = forksafe.Lock()
+
+# Number of seconds the result of an agent reachability check is reused for
+_AGENT_ERROR_TTL = 30.0
+# Agent reachability check results keyed by agent URL, with the time they were checked at
+_AGENT_ERRORS = {}  # type: Dict[str, Tuple[float, Optional[str]]]
+_AGENT_ERRORS_LOCK = forksafe.Lock()
+
+# Platform and interpreter information, which cannot change for the lifetime of the process
+_STATIC_INFO = None  # type: Optional[Dict[str, Any]]
+
 
 def in_venv():
     # type: () -> bool
     # Works with both venv and virtualenv
     # https://stackoverflow.com/a/42580137
-    return (
-        "VIRTUAL_ENV" in os.environ
-        or hasattr(sys, "real_prefix")
-        or (hasattr(sys, "base_prefix") and sys.base_prefix != sys.prefix)
-    )
+    global _IN_VENV
+    if _IN_VENV is None:
+        _IN_VENV = (
+            "VIRTUAL_ENV" in os.environ
+            or hasattr(sys, "real_prefix")
+            or (hasattr(sys, "base_prefix") and sys.base_prefix != sys.prefix)
+        )
+    return _IN_VENV
 
 
 def tags_to_str(tags):
     # type: (Dict[str, Any]) -> str
     # Turn a dict of tags to a string "k1:v1,k2:v2,..."
+    if not tags:
+        return ""
     return ",".join(["%s:%s" % (k, v) for k, v in tags.items()])
 
 
+def _get_packages():
+    # type: () -> Dict[str, str]
+    """Return the versions of the installed packages keyed by project name."""
+    global _PACKAGES
+    if _PACKAGES is None:
+        with _PACKAGES_LOCK:
+            if _PACKAGES is None:
+                _PACKAGES = {p.project_name: p.version for p in pkg_resources.working_set}
+    return _PACKAGES
+
+
+def _get_static_info():
+    # type: () -> Dict[str, Any]
+    """Return the platform and interpreter information included in collect()."""
+    global _STATIC_INFO
+    if _STATIC_INFO is None:
+        _STATIC_INFO = dict(
+            # eg. "Linux", "Darwin"
+            os_name=platform.system(),
+            # eg. 12.5.0
+            os_version=platform.release(),
+            is_64_bit=sys.maxsize > 2 ** 32,
+            architecture=platform.architecture()[0],
+            vm=platform.python_implementation(),
+            lang_version=platform.python_version(),
+        )
+    return _STATIC_INFO
+
+
+def _get_agent_error(writer):
+    # type: (AgentWriter) -> Optional[str]
+    """Return the error raised when sending an empty payload to the agent, if any.
+
+    The result is cached per agent URL for ``_AGENT_ERROR_TTL`` seconds.
+    """
+    agent_url = writer.agent_url
+    # DEV: the lock only guards the cache, it is not held while reaching the agent as that can block
+    #      for the socket timeout
+    with _AGENT_ERRORS_LOCK:
+        cached = _AGENT_ERRORS.get(agent_url)
+    if cached is not None and monotonic() - cached[0] < _AGENT_ERROR_TTL:
+        return cached[1]
+
+    agent_error = None  # type: Optional[str]
+    try:
+        writer.write([])
+        writer.flush_queue(raise_exc=True)
+    except Exception as e:
+        agent_error = "Agent not reachable at %s. Exception raised: %s" % (agent_url, str(e))
+
+    with _AGENT_ERRORS_LOCK:
+        _AGENT_ERRORS[agent_url] = (monotonic(), agent_error)
+    return agent_error
+
+
+def _log_writer_info(writer):
+    # type: (LogWriter) -> Tuple[str, Optional[str]]
+    return "AGENTLESS", None
+
+
+def _agent_writer_info(writer):
+    # type: (AgentWriter) -> Tuple[str, Optional[str]]
+    return writer.agent_url, _get_agent_error(writer)
+
+
+_WRITER_INFO = {
+    LogWriter: _log_writer_info,
+    AgentWriter: _agent_writer_info,
+}  # type: Dict[type, Callable[[Any], Tuple[str, Optional[str]]]]
+
+
+def _get_writer_info(writer):
+    # type: (TraceWriter) -> Tuple[str, Optional[str]]
+    """Return the agent URL of the writer and the error raised when reaching the agent, if any."""
+    get_info = _WRITER_INFO.get(type(writer))
+    if get_info is None:
+        # Subclasses of the built-in writers are reported like the writer they extend
+        for writer_cls, get_info in _WRITER_INFO.items():
+            if isinstance(writer, writer_cls):
+                break
+        else:
+            return "CUSTOM", None
+    return get_info(writer)
+
+
 def collect(tracer):
     # type: (Tracer) -> Dict[str, Any]
     """Collect system and library information into a serializable dict."""
 
-    if isinstance(tracer.writer, LogWriter):
-        agent_url = "AGENTLESS"
-        agent_error = None
-    elif isinstance(tracer.writer, AgentWriter):
-        writer = tracer.writer
-        agent_url = writer.agent_url
-        try:
-            writer.write([])
-            writer.flush_queue(raise_exc=True)
-        except Exception as e:
-            agent_error = "Agent not reachable at %s. Exception raised: %s" % (agent_url, str(e))
-        else:
-            agent_error = None
-    else:
-        agent_url = "CUSTOM"
-        agent_error = None
+    agent_url, agent_error = _get_writer_info(tracer.writer)
 
     is_venv = in_venv()
 
-    packages_available = {p.project_name: p.version for p in pkg_resources.working_set}
+    packages_available = _get_packages()
     integration_configs = {}  # type: Dict[str, Union[Dict[str, Any], str]]
+    patched_modules = ddtrace.monkey._PATCHED_MODULES
+    imported_modules = sys.modules
+    configs = ddtrace.config._config
     for module, enabled in ddtrace.monkey.PATCH_MODULES.items():
         # TODO: this check doesn't work in all cases... we need a mapping
         #       between the module and the library name.
         module_available = module in packages_available
-        module_instrumented = module in ddtrace.monkey._PATCHED_MODULES
-        module_imported = module in sys.modules
+        module_instrumented = module in patched_modules
+        module_imported = module in imported_modules
 
         if enabled:
             # Note that integration configs aren't added until the integration
@@ -80,7 +183,7 @@ def collect(tracer):
             # This also doesn't load work in all cases since we don't always
             # name the configuration entry the same as the integration module
             # name :/
-            config = ddtrace.config._config.get(module, "N/A")
+            config = configs.get(module, "N/A")
         else:
             config = None
 
@@ -99,20 +202,19 @@ def collect(tracer):
             integration_configs[module] = "N/A"
 
     pip_version = packages_available.get("pip", "N/A")
+    static_info = _get_static_info()
 
     return dict(
         # Timestamp UTC ISO 8601
         date=datetime.datetime.utcnow().isoformat(),
-        # eg. "Linux", "Darwin"
-        os_name=platform.system(),
-        # eg. 12.5.0
-        os_version=platform.release(),
-        is_64_bit=sys.maxsize > 2 ** 32,
-        architecture=platform.architecture()[0],
-        vm=platform.python_implementation(),
+        os_name=static_info["os_name"],
+        os_version=static_info["os_version"],
+        is_64_bit=static_info["is_64_bit"],
+        architecture=static_info["architecture"],
+        vm=static_info["vm"],
         version=ddtrace.__version__,
         lang="python",
-        lang_version=platform.python_version(),
+        lang_version=static_info["lang_version"],
         pip_version=pip_version,
         in_virtual_env=is_venv,
         agent_url=agent_url,
@@ -125,7 +227,7 @@ def collect(tracer):
         priority_sampler_type=type(tracer.priority_sampler).__name__ if tracer.priority_sampler else "N/A",
         service=ddtrace.config.service or "",
         debug=ddtrace.tracer.log.isEnabledFor(logging.DEBUG),
-        enabled_cli="ddtrace" in os.getenv("PYTHONPATH", ""),
+        enabled_cli=_ENABLED_CLI,
         analytics_enabled=ddtrace.config.analytics_enabled,
         log_injection_enabled=ddtrace.config.logs_injection,
         health_metrics_enabled=ddtrace.config.health_metrics_enabled,
@@ -14,9 +14,12 @@ import mock
 import pytest
 from six import ensure_text
 
+from ddtrace import Pin
 from ddtrace import config
 from ddtrace.constants import ANALYTICS_SAMPLE_RATE_KEY
 from ddtrace.constants import SAMPLING_PRIORITY_KEY
+from ddtrace.contrib.dbapi import TracedCursor
+from ddtrace.contrib.django import _patch as django_patch
 from ddtrace.contrib.django.patch import instrument_view
 from ddtrace.contrib.django.utils import get_request_uri
 from ddtrace.ext import errors
@@ -650,6 +653,34 @@ def test_connection(client, test_spans):
     assert span.get_tag("django.db.alias") == "default"
 
 
+@pytest.mark.parametrize("tags", [None, {"custom": "tag"}])
+def test_connection_already_traced_cursor(test_spans, tags):
+    """
+    When the database cursor is already traced
+        The django tags are added to the pin of the traced cursor
+    """
+
+    class CursorWrapper(object):
+        def __init__(self, cursor):
+            self.cursor = cursor
+
+    class Connection(object):
+        alias = "other"
+        vendor = "sqlite"
+
+        def cursor(self):
+            return CursorWrapper(TracedCursor(object(), Pin("sqlite", tags=tags), None))
+
+    conn = Connection()
+    django_patch.patch_conn(django, conn)
+
+    pin = Pin.get_from(conn.cursor().cursor)
+    assert pin.service == "sqlite"
+    assert_dict_issuperset(pin.tags, {"django.db.vendor": "sqlite", "django.db.alias": "other"})
+    if tags:
+        assert pin.tags["custom"] == "tag"
+
+
 """
 Caching tests
 """
@@ -910,6 +941,32 @@ def test_cache_get_many(test_spans):
     assert_dict_issuperset(span_get_many.meta, expected_meta)
 
 
+def test_cache_get_many_empty_keys(test_spans):
+    # get the default cache
+    cache = django.core.cache.caches["default"]
+
+    cache.get_many([])
+
+    spans = test_spans.get_spans()
+    assert len(spans) == 1
+
+    span_get_many = spans[0]
+    assert span_get_many.resource == "django.core.cache.backends.base.get_many"
+    assert span_get_many.get_tag("django.cache.backend") == "django.core.cache.backends.locmem.LocMemCache"
+    assert "django.cache.key" not in span_get_many.meta
+
+
+def test_cache_get_empty_string_key(test_spans):
+    # get the default cache
+    cache = django.core.cache.caches["default"]
+
+    cache.get("")
+
+    spans = test_spans.get_spans()
+    assert len(spans) == 1
+    assert spans[0].get_tag("django.cache.key") == ""
+
+
 def test_cache_set_many(test_spans):
     # get the default cache
     cache = django.core.cache.caches["default"]
@@ -1127,6 +1184,20 @@ def test_database_service_prefix_precedence(test_spans):
     assert span.service == "django-db"
 
 
+@pytest.mark.django_db
+def test_database_cursor_pin_reused(test_spans):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        pin = Pin.get_from(cursor.cursor)
+    with connection.cursor() as cursor:
+        assert Pin.get_from(cursor.cursor) is pin
+
+    with override_config("django", dict(database_service_name="django-db")):
+        with connection.cursor() as cursor:
+            assert Pin.get_from(cursor.cursor).service == "django-db"
+
+
 def test_cache_service_can_be_overridden(test_spans):
     cache = django.core.cache.caches["default"]
 
@@ -1140,6 +1211,35 @@ def test_cache_service_can_be_overridden(test_spans):
     assert span.service == "test-cache-service"
 
 
+def test_cache_backend_subclass(test_spans):
+    from django.core.cache.backends.locmem import LocMemCache
+
+    class SubLocMemCache(LocMemCache):
+        pass
+
+    LocMemCache("parent", {}).get("missing_key")
+    SubLocMemCache("child", {}).get("missing_key")
+
+    spans = test_spans.get_spans()
+    assert len(spans) == 2
+    assert spans[0].get_tag("django.cache.backend") == "django.core.cache.backends.locmem.LocMemCache"
+    assert spans[1].get_tag("django.cache.backend") == "tests.contrib.django.test_django.SubLocMemCache"
+
+
+def test_cache_key_prefix_resource(test_spans):
+    from django.core.cache.backends.locmem import LocMemCache
+
+    LocMemCache("prefixed", {"KEY_PREFIX": "Prefix"}).get("missing_key")
+    LocMemCache("unprefixed", {}).get("missing_key")
+    LocMemCache("prefixed", {"KEY_PREFIX": "Prefix"}).get("missing_key")
+
+    spans = test_spans.get_spans()
+    assert len(spans) == 3
+    assert spans[0].resource == "django.core.cache.backends.locmem.get prefix"
+    assert spans[1].resource == "django.core.cache.backends.locmem.get"
+    assert spans[2].resource == "django.core.cache.backends.locmem.get prefix"
+
+
 def test_django_request_distributed(client, test_spans):
     """
     When making a request to a Django app
@@ -1577,6 +1677,63 @@ def test_template_view_patching():
     assert "dispatch" not in vars(TemplateView)
 
 
+def test_view_class_instrumented_once():
+    """
+    Test to ensure that the methods of a view class are only instrumented once
+    """
+
+    class OnceView(TemplateView):
+        def get(self, request, *args, **kwargs):
+            pass
+
+    with mock.patch.object(
+        django_patch, "_instrument_view_methods", wraps=django_patch._instrument_view_methods
+    ) as instrument_view_methods:
+        instrument_view(django, OnceView)
+        instrument_view(django, OnceView)
+        OnceView.as_view()
+
+    instrumented = [c[0][1] for c in instrument_view_methods.call_args_list]
+    assert instrumented.count(OnceView) == 1
+    assert isinstance(vars(OnceView)["get"], wrapt.ObjectProxy)
+
+
+def test_middleware_instrumented_once():
+    """
+    Test to ensure that the configured middleware is only instrumented once per settings
+    """
+    handler = django.core.handlers.base.BaseHandler()
+    handler.load_middleware()
+
+    with mock.patch.object(
+        django.utils.module_loading, "import_string", wraps=django.utils.module_loading.import_string
+    ) as import_string:
+        handler.load_middleware()
+
+    assert import_string.call_count == 0
+
+
+def test_cached_func_name():
+    class Parent(object):
+        pass
+
+    class Child(Parent):
+        pass
+
+    def func():
+        pass
+
+    assert django_patch._cached_func_name(Parent) == "tests.contrib.django.test_django.Parent"
+    assert vars(Parent)["_dd_func_name"] == "tests.contrib.django.test_django.Parent"
+    # Instances share the name memoized on their class
+    assert django_patch._cached_func_name(Parent()) == "tests.contrib.django.test_django.Parent"
+    # Subclasses do not inherit the name memoized on their parent
+    assert django_patch._cached_func_name(Child()) == "tests.contrib.django.test_django.Child"
+    # Functions are named after themselves, not their type
+    assert django_patch._cached_func_name(func) == "tests.contrib.django.test_django.func"
+    assert "_dd_func_name" not in vars(type(func))
+
+
 class _MissingSchemeRequest(django.http.HttpRequest):
     @property
     def scheme(self):
@@ -8,10 +8,24 @@ class TestDjangoPatch(PatchTestCase.Base):
     __patch_func__ = patch
     __unpatch_func__ = None
 
+    # DEV: BaseHandler.get_response is replaced with a plain function instead of a wrapt wrapper
+    def assert_get_response_patched(self, django):
+        get_response = django.core.handlers.base.BaseHandler.get_response
+        self.assertTrue(hasattr(get_response, "__dd_orig"), "{} is not patched".format(get_response))
+
+    def assert_get_response_not_patched(self, django):
+        get_response = django.core.handlers.base.BaseHandler.get_response
+        self.assertFalse(hasattr(get_response, "__dd_orig"), "{} is patched".format(get_response))
+
+    def assert_get_response_not_double_patched(self, django):
+        self.assert_get_response_patched(django)
+        get_response = getattr(django.core.handlers.base.BaseHandler.get_response, "__dd_orig")
+        self.assertFalse(hasattr(get_response, "__dd_orig"), "{} is patched twice".format(get_response))
+
     def assert_module_patched(self, django):
         self.assert_wrapped(django.apps.registry.Apps.populate)
         self.assert_wrapped(django.core.handlers.base.BaseHandler.load_middleware)
-        self.assert_wrapped(django.core.handlers.base.BaseHandler.get_response)
+        self.assert_get_response_patched(django)
         self.assert_wrapped(django.template.base.Template.render)
         if django.VERSION >= (2, 0, 0):
             self.assert_wrapped(django.urls.path)
@@ -22,7 +36,7 @@ class TestDjangoPatch(PatchTestCase.Base):
     def assert_not_module_patched(self, django):
         self.assert_not_wrapped(django.apps.registry.Apps.populate)
         self.assert_not_wrapped(django.core.handlers.base.BaseHandler.load_middleware)
-        self.assert_not_wrapped(django.core.handlers.base.BaseHandler.get_response)
+        self.assert_get_response_not_patched(django)
         self.assert_not_wrapped(django.template.base.Template.render)
         if django.VERSION >= (2, 0, 0):
             self.assert_not_wrapped(django.urls.path)
@@ -33,7 +47,7 @@ class TestDjangoPatch(PatchTestCase.Base):
     def assert_not_module_double_patched(self, django):
         self.assert_not_double_wrapped(django.apps.registry.Apps.populate)
         self.assert_not_double_wrapped(django.core.handlers.base.BaseHandler.load_middleware)
-        self.assert_not_double_wrapped(django.core.handlers.base.BaseHandler.get_response)
+        self.assert_get_response_not_double_patched(django)
         self.assert_not_double_wrapped(django.template.base.Template.render)
         if django.VERSION >= (2, 0, 0):
             self.assert_not_double_wrapped(django.urls.path)
@@ -16,6 +16,7 @@ from ddtrace import Span
 from ddtrace.internal import debug
 from ddtrace.internal.compat import PY2
 from ddtrace.internal.compat import PY3
+from ddtrace.internal.writer import AgentWriter
 from ddtrace.internal.writer import TraceWriter
 import ddtrace.sampler
 from tests.subprocesstest import SubprocessTestCase
@@ -27,6 +28,14 @@ from .test_integration import AGENT_VERSION
 pytestmark = pytest.mark.skipif(AGENT_VERSION == "testagent", reason="The test agent doesn't support startup logs.")
 
 
+@pytest.fixture(autouse=True)
+def reset_agent_errors():
+    # The agent reachability check results are cached for the whole process
+    debug._AGENT_ERRORS.clear()
+    yield
+    debug._AGENT_ERRORS.clear()
+
+
 def re_matcher(pattern):
     pattern = re.compile(pattern)
 
@@ -145,6 +154,24 @@ def test_debug_post_configure():
     assert re.match("^Agent not reachable.*No such file or directory", agent_error)
 
 
+def test_debug_agent_error_cached():
+    tracer = ddtrace.Tracer()
+    tracer.configure(hostname="0.0.0.0", port=1234)
+
+    agent_error = debug.collect(tracer).get("agent_error")
+    assert re.match("^Agent not reachable.*Connection refused", agent_error)
+
+    # The reachability of the agent is not checked again within the TTL
+    with mock.patch.object(tracer.writer, "flush_queue") as flush_queue:
+        assert debug.collect(tracer).get("agent_error") == agent_error
+    flush_queue.assert_not_called()
+
+    with mock.patch.object(debug, "_AGENT_ERROR_TTL", 0):
+        with mock.patch.object(tracer.writer, "flush_queue") as flush_queue:
+            assert debug.collect(tracer).get("agent_error") is None
+    flush_queue.assert_called_once_with(raise_exc=True)
+
+
 class TestGlobalConfig(SubprocessTestCase):
     @run_in_subprocess(
         env_overrides=dict(
@@ -299,6 +326,19 @@ def test_custom_writer():
     assert info.get("agent_url") == "CUSTOM"
 
 
+def test_agent_writer_subclass():
+    tracer = ddtrace.Tracer()
+
+    class SubAgentWriter(AgentWriter):
+        pass
+
+    tracer.writer = SubAgentWriter("http://0.0.0.0:1234")
+    info = debug.collect(tracer)
+
+    assert info.get("agent_url") == "http://0.0.0.0:1234"
+    assert re.match("^Agent not reachable.*Connection refused", info.get("agent_error"))
+
+
 def test_different_samplers():
     tracer = ddtrace.Tracer()
     tracer.configure(sampler=ddtrace.sampler.RateSampler())
@@ -307,6 +347,14 @@ def test_different_samplers():
     assert info.get("sampler_type") == "RateSampler"
 
 
+def test_tracer_tags():
+    tracer = ddtrace.Tracer()
+    assert debug.collect(tracer).get("tracer_tags") == ""
+
+    tracer.set_tags({"a": "b", "c": 1})
+    assert sorted(debug.collect(tracer).get("tracer_tags").split(",")) == ["a:b", "c:1"]
+
+
 def test_error_output_ddtracerun_debug_mode():
     p = subprocess.Popen(
         ["ddtrace-run", "python", "tests/integration/hello.py"],